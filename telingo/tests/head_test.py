@@ -99,3 +99,8 @@ class TestHead(unittest.TestCase):
             [ '#external __false(__t).'
             , '&__tel_head(__t) { >(>?(a)) } :- __aux_0(__t).'
             , 'a(__t): 1 <= (__t-__S) :- __aux_0(__S); __false(__t).']))
+        # head elements appear in the order their ranges first occur
+        self.assertEqual(transform("> > b | > a | c")[1][2],
+            'b(__t): 2 <= (__t-__S), (__t-__S) <= 2; '
+            'a(__t): 1 <= (__t-__S), (__t-__S) <= 1; '
+            'c(__t): (__t-__S) <= 0 :- __aux_0(__S); __false(__t).')
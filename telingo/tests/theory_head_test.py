@@ -37,6 +37,17 @@ class TestTheoryHead(unittest.TestCase):
         self.assertEqual(theory_atoms("&tel { ~a }."), ['(~a)@0'])
         self.assertEqual(theory_atoms("&tel { a&b }."), ['(a&b)@0'])
         self.assertEqual(theory_atoms("&tel { a|b }."), ['(a|b)@0'])
+        self.assertEqual(theory_atoms("&tel { a&b&c }."), ['(a&b&c)@0'])
+        self.assertEqual(theory_atoms("&tel { a|(b&c)|d }."), ['(a|(b&c)|d)@0'])
+        self.assertEqual(theory_atoms("&tel { a & &true }."), ['a@0'])
+        self.assertEqual(theory_atoms("&tel { a | &true }."), ['&true@0'])
+        self.assertEqual(theory_atoms("&tel { ~ &false }."), ['&true@0'])
+        self.assertEqual(theory_atoms("&tel { >: &true }."), ['&true@0'])
+        self.assertEqual(theory_atoms("&tel { > &false }."), ['&false@0'])
+        self.assertEqual(theory_atoms("&tel { a >? &false }."), ['&false@0'])
+        self.assertEqual(theory_atoms("&tel { a >* &true }."), ['&true@0'])
+        self.assertEqual(theory_atoms("&tel { > &true }."), ['(1>&true)@0'])
+        self.assertEqual(theory_atoms("&tel { >: &false }."), ['(1>:&false)@0'])
         self.assertEqual(theory_atoms("&tel { &final }."), ['(~(~__final))@0'])
         self.assertEqual(theory_atoms("&tel { &true }."), ['&true@0'])
         self.assertEqual(theory_atoms("&tel { &false }."), ['&false@0'])
@@ -95,6 +95,11 @@ class TestClassify(unittest.TestCase):
         self.assertFalse(_tf.is_normal(parse_rule("not a.")))
         self.assertFalse(_tf.is_normal(parse_rule("{a}.")))
 
+    def test_classify(self):
+        for r in [":-p.", "#false :- p.", "not q :- p.", "not not q :- p.", "p.", "a :- b.", "{p}.", "a | b.", "not a:#true."]:
+            rule = parse_rule(r)
+            self.assertEqual(_tf.classify_rule(rule), (_tf.is_constraint(rule), _tf.is_normal(rule)))
+
 class TestProgramTransformer(unittest.TestCase):
     def test_rule(self):
         # simple rules
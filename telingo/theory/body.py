@@ -9,6 +9,10 @@ from telingo.util import getattr_
 from .formula import *
 from .path import *
 
+# the names of the truth values differ between clingo versions
+g_truth_true = getattr_(_clingo.TruthValue, "_True", "True_", "True")
+g_truth_false = getattr_(_clingo.TruthValue, "_False", "False_", "False")
+
 # Base for Body Formulas {{{1
 
 class StepData:
@@ -458,9 +462,7 @@ class Next(BodyFormula):
                 data.done = True
             else:
                 data.literal = ctx.backend.add_atom()
-                true = getattr_(_clingo.TruthValue, "_True", "True_", "True")
-                false = getattr_(_clingo.TruthValue, "_False", "False_", "False")
-                ctx.backend.add_external(data.literal, true if self.__weak else false)
+                ctx.backend.add_external(data.literal, g_truth_true if self.__weak else g_truth_false)
                 ctx.add_todo(self, step)
                 data.done = False
         elif not data.done:
@@ -9,7 +9,6 @@ from collections import namedtuple as _namedtuple
 from . import body as _bd
 from .formula import *
 import itertools as _it
-import functools as _ft
 from clingo import ast as _ast
 
 
@@ -24,54 +23,50 @@ def new_tuple(name, fields, keys, tostring=None):
     return ret
 
 
-class FormulaToStr(_tf.TelTransformer):
-    """
-    Converts head formuals to string.
-    """
-    def visit_TelAtom(self, x):
-        args = "" if len(x.arguments) == 0 else "({})".format(",".join(map(str, x.arguments)))
-        sign = "" if x.positive else "-"
-        return "{}{}{}".format(sign, x.name, args)
+# string representations of head formulas, which double as their unique keys
 
-    def visit_TelNext(self, x):
-        op = ">:" if x.weak else ">"
-        return "({}{}{})".format(x.lhs, op, self(x.rhs))
+def atom_str(x):
+    sign = "" if x.positive else "-"
+    if not x.arguments:
+        return f"{sign}{x.name}"
+    return f"{sign}{x.name}({','.join([str(arg) for arg in x.arguments])})"
 
-    def visit_TelUntil(self, x):
-        op = ">?" if x.until else ">*"
-        lhs = "" if x.lhs is None else self(x.lhs)
-        return "({}{}{})".format(lhs, op, self(x.rhs))
+def next_str(x):
+    return f"({x.lhs}{'>:' if x.weak else '>'}{x.rhs})"
 
-    def visit_TelClause(self, x):
-        if len(x.elements) == 1:
-            return self(x.elements[0])
-        op = "&" if x.conjunctive else "|"
-        return "({})".format(op.join(map(self, x.elements)))
+def until_str(x):
+    return f"({'' if x.lhs is None else x.lhs}{'>?' if x.until else '>*'}{x.rhs})"
 
-    def visit_TelNegation(self, x):
-        return "(~{})".format(self(x.rhs))
+def clause_str(x):
+    if len(x.elements) == 1:
+        return str(x.elements[0])
+    return f"({('&' if x.conjunctive else '|').join([str(y) for y in x.elements])})"
 
-    def visit_TelConstant(self, x):
-        return "&true" if x.value else "&false"
+def negation_str(x):
+    return f"(~{x.rhs})"
 
-    def visit_TelShift(self, x):
-        if x.lhs == 0:
-            return "(~(~{})".format(x.rhs)
-        elif x.lhs < 0:
-            return "(~(~({}<{}))".format(-x.lhs, x.rhs)
-        elif x.lhs > 0:
-            return "(~(~({}>{}))".format(x.lhs, x.rhs)
+def constant_str(x):
+    return "&true" if x.value else "&false"
 
-def formula_to_str(x):
-    return FormulaToStr()(x)
+def shift_str(x):
+    if x.lhs == 0:
+        return f"(~(~{x.rhs})"
+    elif x.lhs < 0:
+        return f"(~(~({-x.lhs}<{x.rhs}))"
+    else:
+        return f"(~(~({x.lhs}>{x.rhs}))"
 
-TelNext = new_tuple("TelNext", ["lhs", "rhs", "weak"], ["rhs"], formula_to_str)
-TelUntil = new_tuple("TelUntil", ["lhs", "rhs", "until"], ["lhs", "rhs"], formula_to_str)
-TelAtom = new_tuple("TelAtom", ["positive", "name", "arguments"], ["arguments"], formula_to_str)
-TelClause = new_tuple("TelClause", ["elements", "conjunctive"], ["elements"], formula_to_str)
-TelNegation = new_tuple("TelNegation", ["rhs"], ["rhs"], formula_to_str)
-TelConstant = new_tuple("TelConstant", ["value"], [], formula_to_str)
-TelShift = new_tuple("TelShift", ["lhs", "rhs"], [], formula_to_str)
+TelNext = new_tuple("TelNext", ["lhs", "rhs", "weak"], ["rhs"], next_str)
+TelUntil = new_tuple("TelUntil", ["lhs", "rhs", "until"], ["lhs", "rhs"], until_str)
+TelAtom = new_tuple("TelAtom", ["positive", "name", "arguments"], ["arguments"], atom_str)
+TelClause = new_tuple("TelClause", ["elements", "conjunctive"], ["elements"], clause_str)
+TelNegation = new_tuple("TelNegation", ["rhs"], ["rhs"], negation_str)
+TelConstant = new_tuple("TelConstant", ["value"], [], constant_str)
+TelShift = new_tuple("TelShift", ["lhs", "rhs"], [], shift_str)
+
+# the atoms marking the initial and final step are immutable and shared
+g_initial_atom = TelAtom(True, "__initial", [])
+g_final_atom = TelAtom(True, "__final", [])
 
 
 def create_atom(rep, add_formula, positive):
@@ -110,13 +105,33 @@ def create_formula(rep, add_formula):
         args = rep.arguments
         if rep.name in g_binary_operators and len(args) == 2:
             if rep.name in ("|", "&"):
-                lhs = create_formula(args[0], add_formula)
-                rhs = create_formula(args[1], add_formula)
-                return add_formula(TelClause([lhs, rhs], rep.name == "&"))
+                # nested clauses of the same kind are merged into one and
+                # constants are folded
+                conjunctive = rep.name == "&"
+                elements = []
+                absorbing = None
+                for arg in args:
+                    y = create_formula(arg, add_formula)
+                    if type(y) is TelConstant:
+                        if y.value != conjunctive:
+                            absorbing = y
+                    elif type(y) is TelClause and y.conjunctive == conjunctive:
+                        elements.extend(y.elements)
+                    else:
+                        elements.append(y)
+                if absorbing is not None:
+                    return absorbing
+                if not elements:
+                    return add_formula(TelConstant(conjunctive))
+                if len(elements) == 1:
+                    return elements[0]
+                return add_formula(TelClause(elements, conjunctive))
             else:
                 raise RuntimeError("invalid temporal formula: {}".format(rep))
         elif rep.name in g_unary_operators and len(args) == 1:
             arg = create_formula(args[0], add_formula)
+            if type(arg) is TelConstant:
+                return add_formula(TelConstant(not arg.value))
             return add_formula(TelNegation(arg))
         elif rep.name in g_tel_operators:
             if rep.name in ("<", "<:", "<;", "<:;", "<*", "<?", "<<"):
@@ -124,23 +139,30 @@ def create_formula(rep, add_formula):
             rhs = create_formula(args[-1], add_formula)
             if rep.name == ">" or rep.name == ">:":
                 lhs = 1 if len(args) == 1 else create_number(args[0])
-                return rhs if lhs == 0 else add_formula(TelNext(lhs, rhs, rep.name == ">:"))
+                weak = rep.name == ">:"
+                # a weak next of &true and a strong next of &false are constant
+                if lhs == 0 or (type(rhs) is TelConstant and rhs.value == weak):
+                    return rhs
+                return add_formula(TelNext(lhs, rhs, weak))
             lhs = None if len(args) == 1 else create_formula(args[0], add_formula)
             if rep.name in (";>", ";>:"):
                 return add_formula(TelClause([lhs, TelNext(1, rhs, rep.name == ";>:")], True))
             elif rep.name in (">*", ">?"):
+                # both operators reduce to a constant right-hand side
+                if type(rhs) is TelConstant:
+                    return rhs
                 return add_formula(TelUntil(lhs, rhs, rep.name == ">?"))
             else:
                 assert(rep.name == ">>")
-                final = add_formula(TelAtom(True, "__final", []))
+                final = add_formula(g_final_atom)
                 rhs = add_formula(TelClause([add_formula(TelNegation(final)), rhs], False))
                 return add_formula(TelUntil(None, rhs, False))
         elif rep.name == "&":
             arg = rep.arguments[0]
             if arg.type == _clingo.TheoryTermType.Symbol:
                 if arg.name == "initial" or arg.name == "final":
-                    name = "__{}".format(arg.name)
-                    return add_formula(TelNegation(TelNegation(TelAtom(True, name, []))))
+                    atom = g_initial_atom if arg.name == "initial" else g_final_atom
+                    return add_formula(TelNegation(TelNegation(atom)))
                 elif arg.name == "true" or arg.name == "false":
                     return add_formula(TelConstant(arg.name == "true"))
                 else:
@@ -221,8 +243,11 @@ class HeadFormulaToBodyFormula(_tf.TelTransformer):
 
     def visit_TelClause(self, x):
         op = "&" if x.conjunctive else "|"
-        elements = map(self, x.elements)
-        return _ft.reduce(lambda l, r: _bd.BooleanFormula(op, l, r), elements)
+        elements = iter(x.elements)
+        ret = self(next(elements))
+        for y in elements:
+            ret = _bd.BooleanFormula(op, ret, self(y))
+        return ret
 
     def visit_TelNegation(self, x):
         return self.__add_formula(_bd.Negation(self(x.rhs)))
@@ -245,13 +270,12 @@ class ClauseToRule(_tf.TelTransformer):
             self.__head.append(atom.literal)
 
     def visit_TelShift(self, x, ctx, step):
-        stp = lambda x, n, w: x
-        if x.lhs != 0:
-            stp = _bd.Next if x.lhs > 0 else _bd.Previous
-        neg = lambda x: ctx.add_formula(_bd.Negation(x))
-        nxt = lambda l, r: ctx.add_formula(stp(r, abs(l), False))
         rhs = head_formula_to_body_formula(x.rhs, ctx.add_formula)
-        frm = neg(nxt(x.lhs, rhs))
+        if x.lhs > 0:
+            rhs = _bd.Next(rhs, x.lhs, False)
+        elif x.lhs < 0:
+            rhs = _bd.Previous(rhs, -x.lhs, False)
+        frm = ctx.add_formula(_bd.Negation(ctx.add_formula(rhs)))
         self.__body.append(frm.translate(ctx, step))
 
 def translate_clause(clause, ctx, step, body_literal):
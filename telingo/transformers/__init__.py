@@ -89,7 +89,7 @@ def transform(inputs, callback):
     loc = _ast.Location(_ast.Position('<transform>', 1, 1), _ast.Position('<transform>', 1, 1))
     future_predicates = set()
     constraint_parts  = {}
-    time              = _ast.SymbolicTerm(loc, _clingo.Function(_tf.g_time_parameter_name))
+    time              = _ast.SymbolicTerm(loc, _tf.g_time_parameter)
     wrap_lit          = lambda a: _ast.Literal(loc, _ast.Sign.NoSign, a)
 
     # apply transformer to program
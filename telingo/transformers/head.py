@@ -5,86 +5,110 @@ Module with functions to transform heads referring to the future.
 from . import transformer as _tf
 
 import clingo as _clingo
+import itertools as _it
+from bisect import bisect_left as _bisect_left, bisect_right as _bisect_right
 from clingo import ast as _ast
-from numbers import Number as _Number
-from operator import itemgetter as _itemgetter
 
 # {{{ data structures
 
 g_tel_false_atom = "__false"
-g_tel_keywords = ["true", "false", "final", "initial"]
+g_tel_keywords = frozenset(["true", "false", "final", "initial"])
 g_tel_shift_variable = "__S"
+g_infinity = float("inf")
 
 def time_parameter(loc):
-    return _ast.SymbolicTerm(loc, _clingo.Function(_tf.g_time_parameter_name))
+    return _ast.SymbolicTerm(loc, _tf.g_time_parameter)
 
-class Interval:
-    def __init__(self, left, right):
-        self.left  = left
-        self.right = right
+def head_error(loc):
+    """
+    Returns the error for an invalid temporal formula at the given location.
+    """
+    return RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(loc)))
 
-    def before(self, other):
-        return self.right < other.left
+def term_error(loc):
+    """
+    Returns the error for an invalid term at the given location.
+    """
+    return RuntimeError("invalid term: {}".format(_tf.str_location(loc)))
 
-    def union(self, other):
-        self.left  = min(self.left, other.left)
-        self.right = max(self.right, other.right)
+def interval_add(lefts, rights, left, right):
+    """
+    Adds interval [left,right) to the sorted and disjoint intervals given by
+    the parallel lists lefts and rights merging intervals where necessary.
+    """
+    # both bound lists are sorted because the intervals are disjoint
+    i = _bisect_left(rights, left)
+    j = _bisect_right(lefts, right, i)
 
-    def empty(self):
-        return self.left >= self.right
+    if i == j:
+        lefts.insert(i, left)
+        rights.insert(i, right)
+    else:
+        lefts[i:j] = (min(left, lefts[i]),)
+        rights[i:j] = (max(right, rights[j-1]),)
 
-    def __repr__(self):
-        return "({!r},{!r})".format(self.left, self.right)
+def interval_contains(lefts, rights, left, right):
+    """
+    Checks if interval [left,right) is contained in the sorted and disjoint
+    intervals given by the parallel lists lefts and rights.
+    """
+    if left >= right:
+        return True
 
-    def __str__(self):
-        return "[{},{})".format(self.left, self.right)
+    i = _bisect_left(rights, left)
+    return i < len(lefts) and lefts[i] <= left and right <= rights[i]
+
+def merge_intervals(intervals):
+    """
+    Returns the sorted and disjoint intervals covering exactly the given
+    (possibly overlapping) half-open intervals as a list of pairs.
+    """
+    ret = []
+    for left, right in sorted(intervals):
+        if left >= right:
+            continue
+        if ret and left <= ret[-1][1]:
+            if right > ret[-1][1]:
+                ret[-1] = (ret[-1][0], right)
+        else:
+            ret.append((left, right))
+    return ret
 
 class IntervalSet:
-    def __init__(self, elements = []):
-        self.__elements = []
-        for x in elements:
-            self.add(x)
+    """
+    Set of half-open intervals stored as sorted parallel lists of left and
+    right bounds.
+
+    Kept only as a public helper; the translation itself uses merge_intervals.
+    """
+    __slots__ = ("__lefts", "__rights")
+
+    def __init__(self, elements=None):
+        self.__lefts = []
+        self.__rights = []
+        if elements is not None:
+            for left, right in merge_intervals(elements):
+                self.__lefts.append(left)
+                self.__rights.append(right)
 
     def __len__(self):
-        return len(self.__elements)
+        return len(self.__lefts)
 
     def add(self, x):
-        y = Interval(x[0], x[1])
-        if not y.empty():
-            i = 0
-            while i < len(self) and self.__elements[i].before(y):
-                i += 1
-
-            j = i
-            while j < len(self) and not y.before(self.__elements[j]):
-                y.union(self.__elements[j])
-                j += 1
-
-            if i == j:
-                self.__elements.insert(i, y)
-            else:
-                self.__elements[i:j] = (y,)
+        if x[0] < x[1]:
+            interval_add(self.__lefts, self.__rights, x[0], x[1])
 
     def __iter__(self):
-        for x in self.__elements:
-            yield x.left, x.right
+        return zip(self.__lefts, self.__rights)
 
     def __contains__(self, x):
-        y = Interval(x[0], x[1])
-        if y.empty():
-            return True
-
-        i = 0
-        while i < len(self) and self.__elements[i].before(y):
-            i += 1
-
-        return i < len(self) and self.__elements[i].left <= y.left and y.right <= self.__elements[i].right
+        return interval_contains(self.__lefts, self.__rights, x[0], x[1])
 
     def __repr__(self):
-        return "IntervalSet({!r})".format(self.__elements)
+        return "IntervalSet({!r})".format(list(self))
 
     def __str__(self):
-        return "{{{}}}".format(",".join((str(x) for x in self.__elements)))
+        return "{{{}}}".format(",".join(("[{},{})".format(l, r) for l, r in self)))
 
 # {{{1 parse_raw_formula
 
@@ -124,78 +148,111 @@ class TheoryParser:
         """
         Initializes the parser.
         """
-        self.__stack  = []
-
-    def __priority_and_associativity(self, operator):
-        """
-        Get priority and associativity of the given binary operator.
-        """
-        return self.table[(operator, self.binary)]
-
-    def __priority(self, operator, unary):
-        """
-        Get priority of the given unary or binary operator.
-        """
-        return self.table[(operator, unary)][0]
-
-    def __check(self, operator):
-        """
-        Returns true if the stack has to be reduced because of the precedence
-        of the given binary operator is lower than the preceeding operator on
-        the stack.
-        """
-        if len(self.__stack) < 2:
-            return False
-        priority, associativity = self.__priority_and_associativity(operator)
-        previous_priority       = self.__priority(*self.__stack[-2])
-        return previous_priority > priority or (previous_priority == priority and associativity)
+        self.__operands  = []
+        self.__operators = []
 
     def __reduce(self):
         """
-        Combines the last unary or binary term on the stack.
+        Combines the last operator on the operator stack with its operands.
         """
-        b = self.__stack.pop()
-        operator, unary = self.__stack.pop()
-        if unary:
-            self.__stack.append(_ast.TheoryFunction(b.location, operator, [b]))
+        operands = self.__operands
+        key, _ = self.__operators.pop()
+        operator = g_operator_names[key >> 1]
+        b = operands.pop()
+        if key & 1:
+            operands.append(_ast.TheoryFunction(b.location, operator, [b]))
         else:
-            a = self.__stack.pop()
+            a = operands.pop()
             loc = _ast.Location(a.location.begin, b.location.end)
-            self.__stack.append(_ast.TheoryFunction(loc, operator, [a, b]))
+            operands.append(_ast.TheoryFunction(loc, operator, [a, b]))
 
     def parse(self, x):
         """
         Parses the given unparsed term, replacing it by nested theory
         functions.
+
+        This is a shunting-yard parser with separate stacks for operands and
+        operators. The latter are stored together with their priorities.
         """
-        del self.__stack[:]
+        operands, operators = self.__operands, self.__operators
+        del operands[:]
+        del operators[:]
+        ids, table = g_operator_ids, g_operator_table
         unary = True
         for element in x.elements:
             for operator in element.operators:
-                if not (operator, unary) in self.table:
+                key = ids.get(operator, -1) * 2 + unary
+                if key < 0 or table[key] is None:
                     raise RuntimeError("invalid operator in temporal formula: {}".format(_tf.str_location(x.location)))
-                while not unary and self.__check(operator):
-                    self.__reduce()
-                self.__stack.append((operator, unary))
+                priority, associativity = table[key]
+                if not unary:
+                    # reduce while the preceeding operator binds stronger
+                    while operators and (operators[-1][1] > priority or (operators[-1][1] == priority and associativity)):
+                        self.__reduce()
+                operators.append((key, priority))
                 unary = True
-            self.__stack.append(element.term)
+            operands.append(element.term)
             unary = False
-        while len(self.__stack) > 1:
+        while operators:
             self.__reduce()
-        return self.__stack[0]
+        return operands.pop()
+
+# names of the operators known to the parser
+g_unary_operators  = frozenset(name for name, unary in TheoryParser.table if unary)
+g_binary_operators = frozenset(name for name, unary in TheoryParser.table if not unary)
+g_operators        = g_unary_operators | g_binary_operators
+
+# dense version of the parser table used while parsing; operators are
+# identified by small integers and the table is indexed by 2 * id + unary
+g_operator_names = sorted(g_operators)
+g_operator_ids   = {name: i for i, name in enumerate(g_operator_names)}
+g_operator_table = [None] * (2 * len(g_operator_names))
+for (_name, _unary), _entry in TheoryParser.table.items():
+    g_operator_table[2 * g_operator_ids[_name] + _unary] = _entry
+del _name, _unary, _entry
 
-def parse_raw_formula(x):
+g_theory_parser = TheoryParser()
+
+def parse_raw_formula(x, cache=None):
     """
     Turns the given unparsed term into a term.
+
+    If a cache is given, parse results are looked up and stored in it so that
+    structurally equal unparsed terms are parsed only once.
     """
-    return TheoryParser().parse(x)
+    if cache is None:
+        return g_theory_parser.parse(x)
+    ret = cache.get(x)
+    if ret is None:
+        ret = g_theory_parser.parse(x)
+        cache[x] = ret
+    return ret
 
 # {{{1 theory_term -> term
 
-class TheoryTermToTermTransformer(_ast.Transformer):
+class TheoryTermToTermTransformer(_tf.Transformer):
     """
     This class transforms a given theory term into a plain term.
+
+    Members:
+    __cache  -- Map from already transformed theory terms to their terms.
+    __parsed -- Map from unparsed terms to their parsed terms.
     """
+    def __init__(self, parsed=None):
+        self.__cache  = {}
+        self.__parsed = {} if parsed is None else parsed
+
+    def __call__(self, x):
+        """
+        Transforms the given theory term reusing the result for structurally
+        equal terms.
+        """
+        ret = self.__cache.get(x)
+        if ret is None:
+            ret = self.visit(x)
+            self.__cache[x] = ret
+        return ret
+
     def visit_TheoryTermSequence(self, x):
         """
         Theory term tuples are mapped to term tuples.
@@ -203,7 +260,7 @@ class TheoryTermToTermTransformer(_ast.Transformer):
         if x.sequence_type == _ast.TheorySequenceType.Tuple:
             return _ast.Function(x.location, "", [self(a) for a in x.arguments], False)
         else:
-            raise RuntimeError("invalid term: {}".format(_tf.str_location(x.location)))
+            raise term_error(x.location)
 
     def visit_TheoryFunction(self, x):
         """
@@ -211,35 +268,40 @@ class TheoryTermToTermTransformer(_ast.Transformer):
 
         If the function name refers to a temporal operator, an exception is thrown.
         """
-        isnum = lambda y: y.ast_type == _ast.ASTType.SymbolicTerm and y.symbol.type == _clingo.SymbolType.Number
-        if x.name == "-" and len(x.arguments) == 1:
-            rhs = self(x.arguments[0])
-            if isnum(rhs):
+        name = x.name
+        args = x.arguments
+        if name == "-" and len(args) == 1:
+            rhs = self(args[0])
+            if is_number(rhs):
                 return _ast.SymbolicTerm(x.location, _clingo.Number(-rhs.symbol.number))
             else:
                 return _ast.UnaryOperation(x.location, _ast.UnaryOperator.Minus, rhs)
-        elif (x.name == "+" or x.name == "-") and len(x.arguments) == 2:
-            lhs = self(x.arguments[0])
-            rhs = self(x.arguments[1])
-            op  = _ast.BinaryOperator.Plus if x.name == "+" else _ast.BinaryOperator.Minus
-            if isnum(lhs) and isnum(rhs):
+        elif (name == "+" or name == "-") and len(args) == 2:
+            lhs = self(args[0])
+            rhs = self(args[1])
+            op  = _ast.BinaryOperator.Plus if name == "+" else _ast.BinaryOperator.Minus
+            if is_number(lhs) and is_number(rhs):
                 lhs = lhs.symbol.number
                 rhs = rhs.symbol.number
-                return _ast.SymbolicTerm(x.location, _clingo.Number(lhs + rhs if x.name == "+" else lhs - rhs))
+                return _ast.SymbolicTerm(x.location, _clingo.Number(lhs + rhs if name == "+" else lhs - rhs))
             else:
                 return _ast.BinaryOperation(x.location, op, lhs, rhs)
-        elif x.name == "-" and len(x.arguments) == 2:
-            return _ast.BinaryOperation(x.location, _ast.BinaryOperator.Minus, self(x.arguments[0]), self(x.arguments[1]))
-        elif (x.name, TheoryParser.binary) in TheoryParser.table or (x.name, TheoryParser.unary) in TheoryParser.table:
-            raise RuntimeError("invalid term: {}".format(_tf.str_location(x.location)))
+        elif name in g_operators:
+            raise term_error(x.location)
         else:
-            return _ast.Function(x.location, x.name, [self(a) for a in x.arguments], False)
+            return _ast.Function(x.location, name, [self(a) for a in args], False)
 
     def visit_TheoryUnparsedTerm(self, x):
         """
         Unparsed term are first parsed and then handled by the transformer.
         """
-        return self.visit(parse_raw_formula(x))
+        return self.visit(parse_raw_formula(x, self.__parsed))
+
+def is_number(x):
+    """
+    Check whether the given term is a number.
+    """
+    return x.ast_type == _ast.ASTType.SymbolicTerm and x.symbol.type == _clingo.SymbolType.Number
 
 def theory_term_to_term(x):
     """
@@ -249,10 +311,32 @@ def theory_term_to_term(x):
 
 # {{{1 theory_term -> symbolic_atom
 
-class TheoryTermToAtomTransformer(_ast.Transformer):
+class TheoryTermToAtomTransformer(_tf.Transformer):
     """
     Turns the given theory term into an atom.
+
+    Members:
+    __term   -- Transformer to turn theory terms into terms.
+    __cache  -- Map from already transformed theory terms and signs to their
+                atoms.
+    __parsed -- Map from unparsed terms to their parsed terms.
     """
+    def __init__(self, term_transformer=None, parsed=None):
+        self.__parsed = {} if parsed is None else parsed
+        self.__term   = TheoryTermToTermTransformer(self.__parsed) if term_transformer is None else term_transformer
+        self.__cache  = {}
+
+    def __call__(self, x, positive):
+        """
+        Transforms the given theory term reusing the result for structurally
+        equal terms.
+        """
+        key = (x, positive)
+        ret = self.__cache.get(key)
+        if ret is None:
+            ret = self.visit(x, positive)
+            self.__cache[key] = ret
+        return ret
 
     def __atom(self, location, positive, name, arguments):
         """
@@ -280,23 +364,24 @@ class TheoryTermToAtomTransformer(_ast.Transformer):
         positive -- The classical sign of the atom.
         """
         symbol = x.symbol
-        if x.symbol.type == _clingo.SymbolType.Function and len(symbol.name) > 0:
-            return self.__atom(x.location, positive == symbol.positive, symbol.name, [_ast.Symbol(x.location, a) for a in symbol.arguments])
+        if symbol.type == _clingo.SymbolType.Function and len(symbol.name) > 0:
+            loc = x.location
+            return self.__atom(loc, positive == symbol.positive, symbol.name, [_ast.SymbolicTerm(loc, a) for a in symbol.arguments])
         else:
-            raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
+            raise head_error(x.location)
 
     def visit_Variable(self, x, positive):
         """
         Raises an error.
         """
-        raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
+        raise head_error(x.location)
 
 
     def visit_TheoryTermSequence(self, x, positive):
         """
         Raises an error.
         """
-        raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
+        raise head_error(x.location)
 
     def visit_TheoryFunction(self, x, positive):
         """
@@ -306,16 +391,16 @@ class TheoryTermToAtomTransformer(_ast.Transformer):
         """
         if x.name == "-":
             return self(x.arguments[0], not positive)
-        elif (x.name, TheoryParser.binary) in TheoryParser.table or (x.name, TheoryParser.unary) in TheoryParser.table:
-            raise RuntimeError("invalid term: {}".format(_tf.str_location(x.location)))
+        elif x.name in g_operators:
+            raise term_error(x.location)
         else:
-            return self.__atom(x.location, positive, x.name, [theory_term_to_term(a) for a in x.arguments])
+            return self.__atom(x.location, positive, x.name, [self.__term(a) for a in x.arguments])
 
     def visit_TheoryUnparsedTerm(self, x, positive):
         """
         Unparsed terms are first parsed and then handled by the transformer.
         """
-        return self.visit(parse_raw_formula(x), positive)
+        return self.visit(parse_raw_formula(x, self.__parsed), positive)
 
 def theory_term_to_atom(x, positive=True):
     """
@@ -325,33 +410,48 @@ def theory_term_to_atom(x, positive=True):
 
 # {{{1 theory transformers
 
-class TheoryAtomTransformer(_ast.Transformer):
+class TheoryAtomTransformer(_tf.Transformer):
     """
     Transforms the given theory atom to be processed further.
     """
 
     def __init__(self, atoms):
-        self.__atoms = atoms
+        self.__atoms  = atoms
+        self.__parsed = {}
+        self.__term   = TheoryTermToTermTransformer(self.__parsed)
+        self.__atom   = TheoryTermToAtomTransformer(self.__term, self.__parsed)
 
     def __add_atom(self, x, rng):
-        self.__atoms.append((theory_term_to_atom(x), rng))
+        self.__atoms.append((self.__atom(x, True), rng))
 
     def __add_range(self, location, rng, left, right):
+        """
+        Shifts the given range by left and right.
+
+        Ranges are triples (lhs, rhs, numeric) where numeric indicates that
+        both bounds are integers or infinity. Since both bounds are always
+        shifted by the same term (or the right one to infinity), the result
+        stays numeric as long as the left shift is an integer.
+        """
+        term, number = _ast.SymbolicTerm, _clingo.Number
+        binop, plus  = _ast.BinaryOperation, _ast.BinaryOperator.Plus
+
         def add(a, b):
-            if a == 0:
+            a_int, b_int = type(a) is int, type(b) is int
+            if a_int and b_int:
+                return a + b
+            elif a is g_infinity or b is g_infinity:
+                return g_infinity
+            elif a_int and a == 0:
                 return b
-            elif b == 0:
+            elif b_int and b == 0:
                 return a
-            elif a == float("inf") or b == float("inf"):
-                return float("inf")
-            elif isinstance(a, _Number) and isinstance(b, _Number):
-                return a + b
             else:
-                lhs = _ast.SymbolicTerm(location, _clingo.Number(a)) if isinstance(a, _Number) else a
-                rhs = _ast.SymbolicTerm(location, _clingo.Number(b)) if isinstance(b, _Number) else b
-                return _clingo.ast.BinaryOperation(location, _ast.BinaryOperator.Plus, lhs, rhs)
+                lhs = term(location, number(a)) if a_int else a
+                rhs = term(location, number(b)) if b_int else b
+                return binop(location, plus, lhs, rhs)
 
-        return add(left, rng[0]), add(right, rng[1])
+        return add(left, rng[0]), add(right, rng[1]), rng[2] and type(left) is int
 
     def visit_SymbolicTerm(self, x, rng):
         self.__add_atom(x, rng)
@@ -361,60 +461,122 @@ class TheoryAtomTransformer(_ast.Transformer):
         """
         Raises an error.
         """
-        raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
+        raise head_error(x.location)
 
     def visit_TheoryTermSequence(self, x, rng):
         """
         Raises an error.
         """
-        raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
+        raise head_error(x.location)
 
     def visit_TheoryUnparsedTerm(self, x, rng):
         """
         Unparsed terms are first parsed and then handled by the transformer.
         """
-        return self.visit(parse_raw_formula(x), rng)
+        return self.visit(parse_raw_formula(x, self.__parsed), rng)
 
-    def visit_TheoryFunction(self, x, rng):
+    def __expand_atom(self, x, rng, lhs, rhs, todo):
         """
-        Transforms the given theory function into a temporal formula.
+        Classically negated atoms are added as they are.
         """
-        is_binary = (x.name, TheoryParser.binary) in TheoryParser.table and len(x.arguments) == 2
-        is_unary  = (x.name, TheoryParser.unary) in TheoryParser.table and len(x.arguments) == 1
-        if is_unary or is_binary:
-            if x.name == "-":
-                self.__add_atom(x, rng)
-                return x
-            elif x.name == "~":
-                return x
-
-            lhs = None if is_unary else x.arguments[0]
-            rhs = x.arguments[0 if is_unary else 1]
-
-            if x.name == ">" or x.name == ">:":
-                if lhs is None:
-                    lhs = 1
-                else:
-                    lhs = theory_term_to_term(x.arguments[0])
-                    if lhs.ast_type == _ast.ASTType.SymbolicTerm and lhs.symbol.type == _clingo.SymbolType.Number:
-                        lhs = lhs.symbol.number
-                self(rhs, self.__add_range(x.location, rng, lhs, lhs))
-            elif x.name == "&" and lhs is None:
-                if rhs.ast_type != _ast.ASTType.SymbolicTerm or len(rhs.symbol.arguments) != 0 or rhs.symbol.name not in g_tel_keywords:
-                    raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
-            else:
-                rng_left, rng_right = rng, rng
-                if x.name == ">?" or x.name == ">*" or x.name == ">>":
-                    rng_left = self.__add_range(x.location, rng, 0, float("inf"))
-                    rng_right = rng_left
-                elif x.name == ";>" or x.name == ";>:":
-                    rng_right = self.__add_range(x.location, rng, 1, 1)
-                if is_binary:
-                    self(lhs, rng_left)
-                self(rhs, rng_right)
+        self.__add_atom(x, rng)
+
+    def __expand_negation(self, x, rng, lhs, rhs, todo):
+        """
+        Negated formulas do not contribute atoms.
+        """
+
+    def __expand_next(self, x, rng, lhs, rhs, todo):
+        """
+        Shifts the range of the subformula by the given number of steps.
+        """
+        if lhs is None:
+            lhs = 1
+        else:
+            lhs = self.__term(lhs)
+            if lhs.ast_type == _ast.ASTType.SymbolicTerm and lhs.symbol.type == _clingo.SymbolType.Number:
+                lhs = lhs.symbol.number
+        todo.append((rhs, self.__add_range(x.location, rng, lhs, lhs)))
+
+    def __expand_conjunction(self, x, rng, lhs, rhs, todo):
+        """
+        Checks keywords or handles conjunctions like other connectives.
+        """
+        if lhs is None:
+            if rhs.ast_type != _ast.ASTType.SymbolicTerm or len(rhs.symbol.arguments) != 0 or rhs.symbol.name not in g_tel_keywords:
+                raise head_error(x.location)
+        else:
+            self.__expand_connective(x, rng, lhs, rhs, todo)
+
+    def __expand_connective(self, x, rng, lhs, rhs, todo):
+        """
+        Keeps the range for all subformulas.
+        """
+        todo.append((rhs, rng))
+        if lhs is not None:
+            todo.append((lhs, rng))
+
+    def __expand_eventually(self, x, rng, lhs, rhs, todo):
+        """
+        Extends the range of all subformulas to the future.
+        """
+        rng = self.__add_range(x.location, rng, 0, g_infinity)
+        todo.append((rhs, rng))
+        if lhs is not None:
+            todo.append((lhs, rng))
+
+    def __expand_sequence(self, x, rng, lhs, rhs, todo):
+        """
+        Shifts the range of the right subformula by one step.
+        """
+        todo.append((rhs, self.__add_range(x.location, rng, 1, 1)))
+        todo.append((lhs, rng))
+
+    # handlers for operators appending subformulas together with their ranges
+    # to the todo list
+    __handlers = {
+        "-"  : __expand_atom,
+        "~"  : __expand_negation,
+        ">"  : __expand_next,
+        ">:" : __expand_next,
+        "&"  : __expand_conjunction,
+        ">?" : __expand_eventually,
+        ">*" : __expand_eventually,
+        ">>" : __expand_eventually,
+        ";>" : __expand_sequence,
+        ";>:": __expand_sequence }
+
+    def __expand(self, x, rng, todo):
+        """
+        Handles the operator of the given theory function appending its
+        subformulas together with their ranges to todo.
+        """
+        arguments = x.arguments
+        if len(arguments) == 2 and x.name in g_binary_operators:
+            lhs, rhs = arguments
+        elif len(arguments) == 1 and x.name in g_unary_operators:
+            lhs, rhs = None, arguments[0]
         else:
             self.__add_atom(x, rng)
+            return
+        self.__handlers.get(x.name, TheoryAtomTransformer.__expand_connective)(self, x, rng, lhs, rhs, todo)
 
+    def visit_TheoryFunction(self, x, rng):
+        """
+        Transforms the given theory function into a temporal formula.
+
+        Nested theory functions are traversed using an explicit stack instead
+        of recursive visits.
+        """
+        todo = [(x, rng)]
+        while todo:
+            y, rng = todo.pop()
+            if y.ast_type == _ast.ASTType.TheoryFunction:
+                self.__expand(y, rng, todo)
+            elif y.ast_type == _ast.ASTType.TheoryUnparsedTerm:
+                todo.append((parse_raw_formula(y, self.__parsed), rng))
+            else:
+                self(y, rng)
         return x
 
     def visit_TheoryAtomElement(self, x):
@@ -423,8 +585,13 @@ class TheoryAtomTransformer(_ast.Transformer):
         """
         # NOTE: in principle this condition can be relaxed...
         if len(x.terms) != 1 or len(x.condition) != 0:
-            raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
-        x.terms[0] = self(x.terms[0], (0, 0))
+            raise head_error(x.location)
+        term = x.terms[0]
+        # plain atoms are added directly without visiting them
+        if term.ast_type == _ast.ASTType.SymbolicTerm or (term.ast_type == _ast.ASTType.TheoryFunction and term.name not in g_operators):
+            self.__add_atom(term, (0, 0, True))
+        else:
+            x.terms[0] = self(term, (0, 0, True))
         return x
 
     def visit_TheoryAtom(self, x):
@@ -434,7 +601,7 @@ class TheoryAtomTransformer(_ast.Transformer):
         The theory atom is renamed from tel to tel_head(__t) and the
         """
         if x.guard is not None:
-            raise RuntimeError("invalid temporal formula in rule head: {}".format(_tf.str_location(x.location)))
+            raise head_error(x.location)
         x.term     = _ast.Function(x.term.location, "__tel_head", [time_parameter(x.term.location)], False)
         x.elements = [self(elem) for elem in x.elements]
         return x
@@ -446,72 +613,65 @@ def transform_theory_atom(x):
     atoms = []
     atom = TheoryAtomTransformer(atoms)(x)
 
-    # maps atoms to a set of numeric ranges
+    # maps atoms to a list of numeric ranges
     numeric = {}
-    # maps ranges to a set of symbolic ranges
+    # maps symbolic ranges to the atoms they apply to (dictionaries are used
+    # as insertion ordered sets)
     other = {}
 
+    loc = atom.location
+    term, number = _ast.SymbolicTerm, _clingo.Number
+
     # add to symbolic ranges converting numeric ranges
     def add(atm, lhs, rhs):
-        if isinstance(lhs, _Number):
-            lhs = _ast.SymbolicTerm(atom.location, _clingo.Number(lhs))
-        if rhs == float("inf"):
-            rhs = _ast.SymbolicTerm(atom.location, _clingo.Supremum)
-        elif isinstance(rhs, _Number):
-            rhs = _ast.SymbolicTerm(atom.location, _clingo.Number(rhs))
+        if type(lhs) is int:
+            lhs = term(loc, number(lhs))
+        if rhs == g_infinity:
+            rhs = term(loc, _clingo.Supremum)
+        elif type(rhs) is int:
+            rhs = term(loc, number(rhs))
 
-        rng = (lhs, rhs)
-        other.setdefault(rng, (rng, {}))[1].setdefault(atm, atm)
+        other.setdefault((lhs, rhs), {})[atm] = None
 
     # split into numeric and symbolic ranges
-    for atm, (lhs, rhs) in atoms:
-        if isinstance(lhs, _Number) and isinstance(rhs, _Number):
-            numeric.setdefault(atm, (atm, IntervalSet()))[1].add((lhs, rhs+1))
+    for atm, (lhs, rhs, is_numeric) in atoms:
+        if is_numeric:
+            numeric.setdefault(atm, []).append((lhs, rhs+1))
         else:
             add(atm, lhs, rhs)
 
     # add combined numeric ranges as symbolic ranges
-    for atm, rngs in numeric.values():
-        for lhs, rhs in rngs:
+    for atm, rngs in numeric.items():
+        for lhs, rhs in merge_intervals(rngs):
             add(atm, lhs, rhs-1)
 
-    # flatten symbolic ranges into a list
-    ranges = []
-    for _, (rng, atoms) in sorted(other.items(), key=_itemgetter(0)):
-        ranges.append((rng, [atm for _, atm in sorted(atoms.items(), key=_itemgetter(0))]))
+    # flatten symbolic ranges into a list (in order of first occurrence)
+    ranges = [(rng, list(atms)) for rng, atms in other.items()]
 
     return atom, ranges
 
 # {{{1 get_variables
 
-class VariablesVisitor(_ast.Transformer):
-    """
-    Visitor to collect variables.
-
-    Attributes:
-    __variables -- reference to the resulting list of variables
-    """
-    def __init__(self, variables):
-        """
-        Initializes the visitor with a reference to a list for storing the
-        visited variables.
-        """
-        self.__variables = variables
-
-    def visit_Variable(self, x):
-        """
-        Stores the variable in the list.
-        """
-        self.__variables[str(x)] = x
-        return x
-
 def get_variables(x):
     """
-    Gets all variables in a formula.
+    Gets all variables in a formula sorted by name.
+
+    The AST is walked iteratively using an explicit stack.
     """
-    v = {}
-    VariablesVisitor(v)(x)
-    return [val for _, val in sorted(v.items(), key=lambda x: x[0])]
+    variables = {}
+    todo = [x]
+    while todo:
+        y = todo.pop()
+        if y.ast_type == _ast.ASTType.Variable:
+            variables[y.name] = y
+            continue
+        for key in y.child_keys:
+            child = getattr(y, key)
+            if isinstance(child, _ast.AST):
+                todo.append(child)
+            elif child is not None:
+                todo.extend(child)
+    return [variables[name] for name in sorted(variables)]
 
 # {{{1 transform_head
 
@@ -523,9 +683,11 @@ def factor_out_tel_formula(x):
             for y in x.elements:
                 ret.extend(factor_out_tel_formula(y))
         else:
-            ret = factor_out_tel_formula(x.elements[0])
-            for y in x.elements[1:]:
-                ret = [a + b for b in factor_out_tel_formula(y) for a in ret]
+            subs = [factor_out_tel_formula(y) for y in x.elements]
+            if not all(subs):
+                return []
+            # the product is taken in reverse so that the first disjunct varies fastest
+            ret = [list(_it.chain.from_iterable(reversed(combo))) for combo in _it.product(*reversed(subs))]
         return ret
     else:
         return [[x]]
@@ -535,9 +697,12 @@ class HeadTransformer:
         self.__num_aux = 0
         self.__false_external = None
 
-    def __aux_atom(self, location, variables, inc=1):
-        self.__num_aux += inc
-        return _ast.Literal(location, _ast.Sign.NoSign, _ast.SymbolicAtom(_ast.Function(location, "__aux_{}".format(self.__num_aux - 1), variables, False)))
+    def __aux_name(self):
+        self.__num_aux += 1
+        return "__aux_{}".format(self.__num_aux - 1)
+
+    def __aux_atom(self, location, name, arguments):
+        return _ast.Literal(location, _ast.Sign.NoSign, _ast.SymbolicAtom(_ast.Function(location, name, arguments, False)))
 
     def __false_atom(self, location):
         return _ast.Literal(location, _ast.Sign.NoSign, _ast.SymbolicAtom(_ast.Function(location, g_tel_false_atom, [time_parameter(location)], False)))
@@ -549,8 +714,9 @@ class HeadTransformer:
         variables    = get_variables(atom)
         param        = time_parameter(loc)
         shift        = _ast.Variable(loc, g_tel_shift_variable)
-        aux          = self.__aux_atom(loc, variables + [param])
-        saux         = self.__aux_atom(loc, variables + [shift], inc=0)
+        name         = self.__aux_name()
+        aux          = self.__aux_atom(loc, name, (*variables, param))
+        saux         = self.__aux_atom(loc, name, (*variables, shift))
         rules        = []
 
         if self.__false_external is None:
@@ -560,9 +726,9 @@ class HeadTransformer:
 
         if ranges:
             elems = []
+            diff  = _ast.BinaryOperation(loc, _ast.BinaryOperator.Minus, param, shift)
             for (lhs, rhs), heads in ranges:
                 cond = []
-                diff = _ast.BinaryOperation(loc, _ast.BinaryOperator.Minus, param, shift)
                 if lhs.ast_type != _ast.ASTType.SymbolicTerm or lhs.symbol.type != _clingo.SymbolType.Number or lhs.symbol.number > 0:
                     cond.append(_ast.Literal(loc, _ast.Sign.NoSign, _ast.Comparison(lhs, [_ast.Guard(_ast.ComparisonOperator.LessEqual, diff)])))
 
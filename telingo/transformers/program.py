@@ -9,10 +9,14 @@ from . import transformer as _tf
 from . import term as _tt
 from . import head as _th
 
-import clingo as _clingo
 from clingo import ast as _ast
 
-class ProgramTransformer(_ast.Transformer):
+# statements with a body, which receive the __final atom in final program parts
+g_body_types = frozenset([
+    _ast.ASTType.Rule, _ast.ASTType.ShowTerm, _ast.ASTType.Minimize, _ast.ASTType.External,
+    _ast.ASTType.Edge, _ast.ASTType.Heuristic, _ast.ASTType.ProjectAtom])
+
+class ProgramTransformer(_tf.Transformer):
     """
     Rewrites all temporal operators in a logic program.
 
@@ -31,13 +35,17 @@ class ProgramTransformer(_ast.Transformer):
     __max_shift        -- The maximum number of steps a rule looks into the
                           future. Determines window to reground constraints.
                           Stored as a list with one integer element to allow
-                          passing by reference.
+                          passing by reference, which is reset in place for
+                          every rule.
     __term_transformer -- The transformer used to rewrite terms.
     __constraint_parts -- Parts that have to be regrounded because of
                           constraints referring to the future.
     __aux_rules        -- Auxiliary always quantified rules added during
                           translation.
     """
+    # terms cannot contain atoms to rewrite
+    _skipped = _tf.g_term_types
+
     def __init__(self, future_predicates, constraint_parts, aux_rules):
         self.__final = False
         self.__head = False
@@ -55,20 +63,28 @@ class ProgramTransformer(_ast.Transformer):
         fun = _ast.Function(loc, "__final", [_ast.SymbolicTerm(loc, param)] if param is not None else [], False)
         x.body.append(_ast.Literal(loc, _ast.Sign.NoSign, _ast.SymbolicAtom(fun)));
 
+    def __wrap(self, loc, atom):
+        """
+        Wraps atoms replacing theory atoms in heads into a double negation.
+        """
+        return _ast.Literal(loc, _ast.Sign.DoubleNegation, atom) if self.__head else atom
+
     def visit(self, x, *args, **kwargs):
         """
         Extends the transformer's generic visit method to add the final atom to
         all AST nodes in final program parts having a body.
 
-        The extension happens before the node is visited normally so the time
-        parameter is added to the atom accordingly.
+        The extension happens after the node has been visited and the final
+        atom is created with its time parameter in place, so it does not have
+        to be visited itself.
         """
-        if self.__final and isinstance(x, _ast.AST) and hasattr(x, "body"):
-            self.__append_final(x)
         if isinstance(x, _ast.ASTSequence):
-            return _ast.Transformer.visit_sequence(self, x, *args, **kwargs)
+            return _tf.Transformer.visit_sequence(self, x, *args, **kwargs)
 
-        return _ast.Transformer.visit(self, x, *args, **kwargs)
+        ret = _tf.Transformer.visit(self, x, *args, **kwargs)
+        if self.__final and ret is not None and ret.ast_type in g_body_types:
+            self.__append_final(ret, _tf.g_time_parameter)
+        return ret
 
     def visit_Rule(self, rule):
         """
@@ -78,20 +94,21 @@ class ProgramTransformer(_ast.Transformer):
         """
         try:
             self.__head = True
-            self.__max_shift = [0]
-            self.__constraint = _tf.is_constraint(rule)
-            self.__normal = _tf.is_normal(rule)
+            self.__max_shift[0] = 0
+            self.__constraint, self.__normal = _tf.classify_rule(rule)
             rule.head = self.visit(rule.head)
             self.__head = False
             rule.body = self.visit(rule.body)
             if self.__max_shift[0] > 0 and not self.__final:
-                last = _ast.Rule(rule.location, rule.head, rule.body[:])
-                self.__append_final(rule, _clingo.Function(_tf.g_time_parameter_name_alt))
+                # the constructor copies the body so appending below does not
+                # affect the last rule
+                last = _ast.Rule(rule.location, rule.head, rule.body)
+                self.__append_final(rule, _tf.g_time_parameter_alt)
                 self.__constraint_parts.setdefault((self.__part, self.__max_shift[0]), []).append((rule, last))
                 return None
         finally:
             self.__head        = False
-            self.__max_shift   = [0]
+            self.__max_shift[0] = 0
             self.__constraint  = False
             self.__normal = False
         return rule
@@ -112,12 +129,16 @@ class ProgramTransformer(_ast.Transformer):
     def visit_ConditionalLiteral(self, literal):
         """
         Make sure that conditions are traversed as non-head literals.
+
+        The literal and the elements of the condition are always literals and
+        visited directly.
         """
-        self.visit(literal.literal)
+        self.visit_Literal(literal.literal)
         head = self.__head
         try:
             self.__head = False
-            self.visit(literal.condition)
+            for lit in literal.condition:
+                self.visit_Literal(lit)
         finally:
             self.__head = head
         return literal
@@ -132,6 +153,47 @@ class ProgramTransformer(_ast.Transformer):
         atom.symbol = self.__term_transformer.visit(atom.symbol, self.__head, not self.__constraint and (not self.__head or not self.__normal), self.__head, self.__max_shift)
         return atom
 
+    def __theory_del(self, atom, term):
+        if not self.__negation and not self.__constraint:
+            raise RuntimeError("dynamic formulas not supported in this context: {}".format(_tf.str_location(atom.location)))
+        term.arguments = [_ast.SymbolicTerm(term.location, _tf.g_time_parameter)]
+        return atom
+
+    def __theory_tel(self, atom, term):
+        if self.__head:
+            atom, rules = self.__head_transformer.transform(atom)
+            self.__aux_rules.extend(rules)
+        else:
+            if not self.__negation and not self.__constraint:
+                raise RuntimeError("temporal formulas not supported in this context: {}".format(_tf.str_location(atom.location)))
+            for element in atom.elements:
+                if len(element.terms) != 1:
+                    raise RuntimeError("invalid temporal formula: {}".format(_tf.str_location(atom.location)))
+                self.visit(element.condition)
+            atom.term = self.__term_transformer.visit(term, False, True, True, self.__max_shift)
+        return atom
+
+    def __theory_initial(self, atom, term):
+        return self.__wrap(atom.location, _ast.SymbolicAtom(_ast.Function(atom.location, "__initial", [_th.time_parameter(atom.location)], False)))
+
+    def __theory_final(self, atom, term):
+        return self.__wrap(atom.location, _ast.SymbolicAtom(_ast.Function(atom.location, "__final", [_th.time_parameter(atom.location)], False)))
+
+    def __theory_true(self, atom, term):
+        return self.__wrap(atom.location, _ast.BooleanConstant(True))
+
+    def __theory_false(self, atom, term):
+        return self.__wrap(atom.location, _ast.BooleanConstant(False))
+
+    # handlers for theory atoms by the name of their term
+    __theory_handlers = {
+        "del"    : __theory_del,
+        "tel"    : __theory_tel,
+        "initial": __theory_initial,
+        "final"  : __theory_final,
+        "true"   : __theory_true,
+        "false"  : __theory_false }
+
     def visit_TheoryAtom(self, atom):
         """
         Rewrites theory atoms related to temporal formulas.
@@ -141,33 +203,11 @@ class ProgramTransformer(_ast.Transformer):
         `__final`, and atoms of form `&true` and `&false` are rewritten to
         `#true` and `#false`.
         """
-        if atom.term.ast_type == _ast.ASTType.Function and len(atom.term.arguments) == 0:
-            time = lambda loc: _ast.SymbolicTerm(loc, _clingo.Function(_tf.g_time_parameter_name))
-            wrap = lambda loc, atom: _ast.Literal(loc, _ast.Sign.DoubleNegation, atom) if self.__head else atom
-            if atom.term.name == "del" :
-                if not self.__negation and not self.__constraint:
-                        raise RuntimeError("dynamic formulas not supported in this context: {}".format(_tf.str_location(atom.location)))
-                atom.term.arguments = [_ast.SymbolicTerm(atom.term.location, _clingo.Function("__t"))]
-            elif atom.term.name == "tel" :
-                if self.__head:
-                    atom, rules = self.__head_transformer.transform(atom)
-                    self.__aux_rules.extend(rules)
-                else:
-                    if not self.__negation and not self.__constraint:
-                        raise RuntimeError("temporal formulas not supported in this context: {}".format(_tf.str_location(atom.location)))
-                    for element in atom.elements:
-                        if len(element.terms) != 1:
-                            raise RuntimeError("invalid temporal formula: {}".format(_tf.str_location(atom.location)))
-                        self.visit(element.condition)
-                    atom.term = self.__term_transformer.visit(atom.term, False, True, True, self.__max_shift)
-            elif atom.term.name == "initial":
-                atom = wrap(atom.location, _ast.SymbolicAtom(_ast.Function(atom.location, "__initial", [time(atom.location)], False)))
-            elif atom.term.name == "final":
-                atom = wrap(atom.location, _ast.SymbolicAtom(_ast.Function(atom.location, "__final", [time(atom.location)], False)))
-            elif atom.term.name == "true":
-                atom = wrap(atom.location, _ast.BooleanConstant(True))
-            elif atom.term.name == "false":
-                atom = wrap(atom.location, _ast.BooleanConstant(False))
+        term = atom.term
+        if term.ast_type == _ast.ASTType.Function and len(term.arguments) == 0:
+            handler = self.__theory_handlers.get(term.name)
+            if handler is not None:
+                atom = handler(self, atom, term)
         return atom
 
     def visit_Program(self, prg):
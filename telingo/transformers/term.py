@@ -11,7 +11,7 @@ from clingo import ast as _ast
 
 from . import transformer as _tf
 
-class TermTransformer(_ast.Transformer):
+class TermTransformer(_tf.Transformer):
     """
     This class traverses the AST of a term until a Function is found. It then
     add a time parameter to its argument and optionally rewrites the and
@@ -24,6 +24,8 @@ class TermTransformer(_ast.Transformer):
                          where shift corresponds to the number of next
                          operators and positive whether the literal is
                          positive.
+    __names           -- Cache mapping predicate names to their split form
+                         (see __split_name).
     """
     def __init__(self, future_predicates):
         """
@@ -32,6 +34,48 @@ class TermTransformer(_ast.Transformer):
         """
         self.__future_predicates = future_predicates
         self.__positive = True
+        self.__names = {}
+
+    def __split_name(self, name, location):
+        """
+        Splits the given predicate name into the name without temporal
+        operators, the shift introduced by primes, flags indicating the
+        initially and finally operators, the name of the corresponding future
+        predicate if the shift is positive, and the shift as a symbol.
+
+        Results are cached because the same predicates occur over and over.
+        """
+        ret = self.__names.get(name)
+        if ret is not None:
+            return ret
+
+        # leading primes shift into the past and trailing ones into the future
+        stripped = name.lstrip("'")
+        n = stripped.rstrip("'")
+        shift = (len(stripped) - len(n)) - (len(name) - len(stripped))
+
+        initially = False
+        if n.startswith("_") and not n.startswith("__"):
+            n = n[1:]
+            if n.startswith("'") or name.startswith("'") or name.endswith("'"):
+                raise RuntimeError("initially operator cannot be used with primes: {}".format(_tf.str_location(location)))
+            initially = True
+
+        finally_ = False
+        if n.endswith("_") and not n.endswith("__"):
+            n = n[:-1]
+            if n.endswith("'") or name.startswith("'") or name.endswith("'"):
+                raise RuntimeError("finally operator cannot be used with primes: {}".format(_tf.str_location(location)))
+            finally_ = True
+            raise RuntimeError("finally operator not yet supported: {}".format(_tf.str_location(location)))
+
+        if initially and finally_:
+            raise RuntimeError("finally and initially operator cannot used together: {}".format(_tf.str_location(location)))
+
+        future = _tf.g_future_prefix + n if shift > 0 else None
+        ret = (n, shift, initially, finally_, future, _clingo.Number(shift))
+        self.__names[name] = ret
+        return ret
 
     def __get_param(self, name, arity, location, replace_future, fail_future, fail_past, max_shift):
         """
@@ -75,33 +119,8 @@ class TermTransformer(_ast.Transformer):
 
         and future_predicates is extended with (p,1,2) -> False
         """
-        n = name.strip("'")
-        shift = 0
-        for c in name:
-            if c == "'":
-                shift -= 1
-            else:
-                break
-        shift += len(name) - len(n) + shift
-
-        initially = False
-        if n.startswith("_") and not n.startswith("__"):
-            n = n[1:]
-            if n.startswith("'") or name.startswith("'") or name.endswith("'"):
-                raise RuntimeError("initially operator cannot be used with primes: {}".format(_tf.str_location(location)))
-            initially = True
-
-        finally_ = False
-        if n.endswith("_") and not n.endswith("__"):
-            n = n[:-1]
-            if n.endswith("'") or name.startswith("'") or name.endswith("'"):
-                raise RuntimeError("finally operator cannot be used with primes: {}".format(_tf.str_location(location)))
-            finally_ = True
-            raise RuntimeError("finally operator not yet supported: {}".format(_tf.str_location(location)))
-
-        if initially and finally_:
-            raise RuntimeError("finally and initially operator cannot used together: {}".format(_tf.str_location(location)))
-        params = [_ast.SymbolicTerm(location, _clingo.Function(_tf.g_time_parameter_name))]
+        n, shift, initially, finally_, future, number = self.__split_name(name, location)
+        params = [_ast.SymbolicTerm(location, _tf.g_time_parameter)]
         if fail_future and (shift > 0 or finally_):
             raise RuntimeError("future atoms not supported in this context: {}".format(_tf.str_location(location)))
         if fail_past and (shift < 0 or initially):
@@ -109,12 +128,12 @@ class TermTransformer(_ast.Transformer):
         if shift > 0:
             if replace_future:
                 self.__future_predicates.add((n, arity, self.__positive, shift))
-                n = _tf.g_future_prefix + n
-                params.insert(0, _ast.SymbolicTerm(location, _clingo.Number(shift)))
+                n = future
+                params.insert(0, _ast.SymbolicTerm(location, number))
             else:
                 max_shift[0] = max(max_shift[0], shift)
         if shift != 0:
-            params[-1] = _ast.BinaryOperation(location, _ast.BinaryOperator.Plus, params[-1], _ast.SymbolicTerm(location, _clingo.Number(shift)))
+            params[-1] = _ast.BinaryOperation(location, _ast.BinaryOperator.Plus, params[-1], _ast.SymbolicTerm(location, number))
         elif initially:
             params[-1] = _ast.SymbolicTerm(location, _clingo.Number(0))
         return (n, params)
@@ -125,7 +144,8 @@ class TermTransformer(_ast.Transformer):
         """
         try:
             self.__positive = not self.__positive
-            return term.update(**self.visit_children(term, *args, **kwargs))
+            term.argument = self.visit(term.argument, *args, **kwargs)
+            return term
         finally:
             self.__positive = not self.__positive
         return term
@@ -3,13 +3,16 @@ This module contains the basic transformer to traves and change an AST as well
 as constants used during translation.
 
 Classes:
-Transformer -- Base class to modify ASTs.
+TelTransformer -- Base class to modify ASTs.
+Transformer    -- Clingo AST transformer dispatching via a per-class table.
 
 Functions:
 str_location   -- Turn a location into a string.
 is_constraint  -- Check whether a statement is a constraint.
 is_normal      -- Check whether a statement is a normal rule.
 is_disjunction -- Check whether a statement is a disjunctive rule.
+classify_rule  -- Check whether a statement is a constraint and whether it
+                  is a normal rule at once.
 
 Constants:
 g_future_prefix           -- Prefix for predicates referring to the future.
@@ -17,6 +20,9 @@ g_variable_prefix         -- Prefix for auxiliary variables.
 g_time_parameter_name     -- Prefix for the time parameter.
 g_time_parameter_name_alt -- Prefix for the second time parameter used when
                              grounding rules within a given range.
+g_term_types              -- AST types of terms, which never contain atoms.
+g_time_parameter          -- Symbol of the time parameter.
+g_time_parameter_alt      -- Symbol of the second time parameter.
 """
 
 import clingo as _clingo
@@ -26,6 +32,12 @@ g_future_prefix = "__future_"
 g_variable_prefix = "X"
 g_time_parameter_name = "__t"
 g_time_parameter_name_alt = "__u"
+g_time_parameter = _clingo.Function(g_time_parameter_name)
+g_time_parameter_alt = _clingo.Function(g_time_parameter_name_alt)
+g_term_types = frozenset([
+    _ast.ASTType.Variable, _ast.ASTType.SymbolicTerm, _ast.ASTType.UnaryOperation,
+    _ast.ASTType.BinaryOperation, _ast.ASTType.Interval, _ast.ASTType.Function,
+    _ast.ASTType.Pool, _ast.ASTType.Guard, _ast.ASTType.Comparison])
 
 def str_location(loc):
     """
@@ -70,6 +82,25 @@ def is_normal(s):
             s.head.sign == _ast.Sign.NoSign and
             s.head.atom.ast_type == _ast.ASTType.SymbolicAtom)
 
+def classify_rule(s):
+    """
+    Returns a pair of Booleans indicating whether the given statement is a
+    constraint and whether it is a normal rule.
+
+    This is equivalent to calling is_constraint and is_normal but inspects the
+    head of the rule only once.
+    """
+    if s.ast_type != _ast.ASTType.Rule:
+        return False, False
+    head = s.head
+    if head.ast_type != _ast.ASTType.Literal:
+        return False, False
+    atom = head.atom
+    atom_type = atom.ast_type
+    positive = head.sign == _ast.Sign.NoSign
+    return ((not positive or (atom_type == _ast.ASTType.BooleanConstant and not atom.value)),
+            positive and atom_type == _ast.ASTType.SymbolicAtom)
+
 def is_disjunction(s):
     """
     Check if a given AST node is a disjunction.
@@ -90,40 +121,72 @@ class TelTransformer:
     Function visit should be called on the root of the AST to be visited. It is
     the users responsibility to visit children of nodes that have node-specific
     visitor.
+
+    Members:
+    _visitors -- Map from node classes to the functions visiting them; filled
+                 lazily and shared by all instances of a class.
     """
+    _visitors = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visitors = {}
+
     def visit_children(self, x, *args, **kwargs):
         """
         Visits and transforms the children of the given node.
+
+        Nodes are tuples whose fields are named by their keys.
         """
-        updated = []
-        for key in x.keys:
-            if key in x.child_keys:
-                value = self.visit(getattr(x, key), *args, **kwargs)
-                updated.append(value)
-            else:
-                updated.append(getattr(x, key))
+        child_keys = x.child_keys
+        updated = [self.visit(value, *args, **kwargs) if key in child_keys else value for key, value in zip(x.keys, x)]
         return x.__class__(*updated)
 
+    def __lookup(self, cls, x):
+        """
+        Determines and caches the function visiting nodes of the given class.
+        """
+        cls_self = type(self)
+        if hasattr(x, "ast_type"):
+            fun = getattr(cls_self, "visit_" + str(x.ast_type), None)
+            if fun is None:
+                fun = cls_self.visit_children
+        else:
+            fun = None
+        self._visitors[cls] = fun
+        return fun
+
     def visit(self, x, *args, **kwargs):
         """
         Visits the given node and returns its transformation.
 
         If there is a matching visit_TYPE function where TYPE corresponds to
         the ASTType of the given node then this function called and its value
-        returned. Otherwise, its children are visited and transformed.
+        returned. Otherwise, its children are visited and transformed. Lists
+        are returned as is if none of their elements changed.
 
         This function accepts additional positional and keyword arguments,
         which are passed to node-specific visit functions and to the visit
         function called for child nodes.
         """
-        if hasattr(x, "ast_type"):
-            attr = "visit_" + str(x.ast_type)
-            if hasattr(self, attr):
-                return getattr(self, attr)(x, *args, **kwargs)
-            else:
-                return self.visit_children(x, *args, **kwargs)
+        cls = type(x)
+        try:
+            fun = self._visitors[cls]
+        except KeyError:
+            fun = self.__lookup(cls, x)
+        if fun is not None:
+            return fun(self, x, *args, **kwargs)
         elif isinstance(x, list):
-            return [self.visit(y, *args, **kwargs) for y in x]
+            # the list is copied only once an element changes
+            ret = x
+            for i, y in enumerate(x):
+                z = self.visit(y, *args, **kwargs)
+                if ret is not x:
+                    ret.append(z)
+                elif z is not y:
+                    ret = x[:i]
+                    ret.append(z)
+            return ret
         elif x is None:
             return x
         else:
@@ -135,6 +198,46 @@ class TelTransformer:
         """
         return self.visit(x, *args, **kwargs)
 
+class Transformer(_ast.Transformer):
+    """
+    Clingo AST transformer that dispatches to visit_TYPE functions via a table
+    computed once per class instead of building and looking up attribute names
+    for every visited node.
+
+    Members:
+    _visitors -- Map from AST types to the visit functions of the class.
+    _skipped  -- AST types without visit function whose nodes are returned
+                 as is without visiting their children.
+    """
+    _visitors = {}
+    _skipped = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visitors = {}
+        for ast_type in _ast.ASTType:
+            fun = getattr(cls, "visit_" + ast_type.name, None)
+            if fun is not None:
+                cls._visitors[ast_type] = fun
+            elif ast_type in cls._skipped:
+                cls._visitors[ast_type] = Transformer._skip
+
+    def _skip(self, ast, *args, **kwargs):
+        """
+        Returns the given AST unchanged.
+        """
+        return ast
+
+    def visit(self, ast, *args, **kwargs):
+        """
+        Dispatch to the visit function for the type of the given AST or visit
+        and transform its children if there is none.
+        """
+        fun = self._visitors.get(ast.ast_type)
+        if fun is not None:
+            return fun(self, ast, *args, **kwargs)
+        return ast.update(**self.visit_children(ast, *args, **kwargs))
+
 _version = _clingo.__version__.split(".")
 if int(_version[0]) >= 5 and int(_version[1]) >= 4:
     External = lambda loc, head, body: _ast.External(loc, head, body, _ast.Function(loc, "false", [], False))